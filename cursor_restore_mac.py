@@ -8,14 +8,63 @@ traditional History folder method and SQLite database exploration.
 """
 
 import os
+import sys
 import json
 import argparse
+import functools
 import shutil
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from operator import itemgetter
 from pathlib import Path
 from urllib.parse import unquote
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Union
+
+# orjson parses JSON in SIMD-accelerated C and is several times faster than
+# the stdlib on the large entries.json trees this script scans. It is an
+# optional speedup; without it we fall back to the stdlib parser.
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# On macOS, libc's copyfile() with COPYFILE_CLONE makes a copy-on-write APFS
+# clone - a metadata-only operation - instead of streaming file bytes through
+# userspace read/write loops. Bind it lazily; everywhere else (or if the
+# clone fails, e.g. on a non-APFS target) we fall back to shutil.copy2.
+_COPYFILE_ALL = 0x000F  # COPYFILE_ACL | COPYFILE_STAT | COPYFILE_XATTR | COPYFILE_DATA
+_COPYFILE_CLONE = 0x1000000
+_copyfile = None
+if sys.platform == 'darwin':
+    try:
+        import ctypes
+        _libc = ctypes.CDLL('libSystem.B.dylib', use_errno=True)
+        _copyfile = _libc.copyfile
+        _copyfile.argtypes = [ctypes.c_char_p, ctypes.c_char_p,
+                              ctypes.c_void_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        _copyfile = None
+
+
+def copy_backup_file(src: str, dst: str):
+    """Copy a single backup file, cloning instead of copying when possible."""
+    if _copyfile is not None:
+        rc = _copyfile(os.fsencode(src), os.fsencode(dst), None,
+                       _COPYFILE_CLONE | _COPYFILE_ALL)
+        if rc == 0:
+            return
+        # Clone refused (existing destination, non-APFS volume, ...);
+        # fall through to a regular copy.
+    shutil.copy2(src, dst)
+
+
+def _flush_lines(lines: List[str]):
+    """Write buffered progress lines in one syscall and clear the buffer."""
+    if lines:
+        sys.stdout.write(''.join(lines))
+        lines.clear()
 
 
 def parse_timestamp(timestamp_ms: int) -> datetime:
@@ -30,8 +79,13 @@ def url_decode_path(url_path: str) -> str:
     return unquote(url_path)
 
 
+@functools.lru_cache(maxsize=8192)
 def normalize_path(path: str) -> str:
-    """Normalize path separators and make it comparable."""
+    """Normalize path separators and make it comparable.
+
+    Memoized: the same paths are normalized repeatedly while scanning
+    history folders, and the result only depends on the input string.
+    """
     # Handle URL-encoded paths first
     if path.startswith('file:///'):
         path = url_decode_path(path)
@@ -51,44 +105,212 @@ def normalize_path(path: str) -> str:
 
 
 def is_path_in_directory(file_path: str, target_dir: str) -> bool:
-    """Check if the file path is within the target directory."""
-    file_path_norm = normalize_path(file_path)
-    target_dir_norm = normalize_path(target_dir)
-    
-    # Ensure target directory ends with / for proper prefix matching
-    if not target_dir_norm.endswith('/'):
-        target_dir_norm += '/'
-    
-    return file_path_norm.startswith(target_dir_norm) or file_path_norm == target_dir_norm.rstrip('/')
+    """Check if the file path is within the target directory.
+
+    Thin wrapper over make_path_matcher for one-off checks; the scan loop
+    builds the matcher once instead.
+    """
+    return make_path_matcher(target_dir)(file_path) is not None
 
 
 def get_relative_path(file_path: str, target_dir: str) -> str:
-    """Get the relative path of a file within the target directory."""
-    file_path_norm = normalize_path(file_path)
-    target_dir_norm = normalize_path(target_dir)
-    
-    # Ensure target directory ends with / for proper prefix matching
-    if not target_dir_norm.endswith('/'):
-        target_dir_norm += '/'
-    
-    if not (file_path_norm.startswith(target_dir_norm) or file_path_norm == target_dir_norm.rstrip('/')):
+    """Get the relative path of a file within the target directory.
+
+    Thin wrapper over make_path_matcher for one-off lookups; raises
+    ValueError when the file falls outside the target.
+    """
+    relative = make_path_matcher(target_dir)(file_path)
+    if relative is None:
         raise ValueError(f"File {file_path} is not within directory {target_dir}")
-    
-    # Remove the target directory prefix
-    if file_path_norm == target_dir_norm.rstrip('/'):
-        # This is the root directory itself
-        return ""
-    
-    relative = file_path_norm[len(target_dir_norm):]
     return relative
 
 
-def find_latest_files_from_history(history_dir: str, target_restore_dir: str, 
+# Persistent cache of entries.json contents, keyed by folder mtime. Re-runs
+# of the script (tweaking the time range or output dir) then read one SQLite
+# file instead of re-opening tens of thousands of tiny JSON files.
+_SCAN_CACHE_PATH = os.path.expanduser('~/.cache/cursor-restore/index.db')
+
+
+def _open_scan_cache() -> Tuple[Optional[sqlite3.Connection], Dict[str, float]]:
+    """Open the persistent scan cache, returning (connection, {folder: mtime}).
+
+    Only the mtimes are loaded up front; the raw bytes are fetched per
+    folder on a cache hit via a primary-key lookup, so the cache file is
+    never materialized in memory as a whole. Best-effort: any problem
+    opening or creating it yields (None, {}) and the scan reads every
+    file as before.
+    """
+    try:
+        os.makedirs(os.path.dirname(_SCAN_CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(_SCAN_CACHE_PATH)
+        conn.execute("CREATE TABLE IF NOT EXISTS scan_cache ("
+                     "folder TEXT PRIMARY KEY, mtime REAL, data BLOB)")
+        mtimes = dict(conn.execute("SELECT folder, mtime FROM scan_cache"))
+        return conn, mtimes
+    except (sqlite3.Error, OSError):
+        return None, {}
+
+
+def _cached_scan_data(conn: sqlite3.Connection, folder_path: str) -> Optional[bytes]:
+    """Fetch one folder's cached entries.json bytes (primary-key lookup)."""
+    try:
+        row = conn.execute("SELECT data FROM scan_cache WHERE folder = ?",
+                           (folder_path,)).fetchone()
+        return row[0] if row else None
+    except sqlite3.Error:
+        return None
+
+
+def _close_scan_cache(conn: Optional[sqlite3.Connection],
+                      records: List[Tuple[str, float, bytes]],
+                      stale: List[str]):
+    """Flush updates, prune rows for vanished folders, and close the cache."""
+    if conn is None:
+        return
+    try:
+        if records:
+            conn.executemany(
+                "INSERT OR REPLACE INTO scan_cache (folder, mtime, data) VALUES (?, ?, ?)",
+                records)
+        if stale:
+            conn.executemany("DELETE FROM scan_cache WHERE folder = ?",
+                             [(folder,) for folder in stale])
+        conn.commit()
+    except (sqlite3.Error, OSError):
+        pass
+    finally:
+        conn.close()
+
+
+def make_path_matcher(target_dirs):
+    """Build a matcher specialized for one or more target directories.
+
+    The returned closure maps a candidate path to its relative path under
+    the matching target, or None when it falls outside all of them. With
+    several roots, each root's files are namespaced under a subdirectory
+    named after the root, so identical relative paths in different roots
+    cannot collide. The normalized prefixes are baked in once, so the hot
+    loop never re-derives them; the multi-root membership test runs
+    through str.startswith with a tuple, which iterates the prefixes in C.
+    """
+    if isinstance(target_dirs, str):
+        target_dirs = [target_dirs]
+
+    prefixes = set()
+    for target_dir in target_dirs:
+        target_norm = normalize_path(target_dir)
+        if not target_norm.endswith('/'):
+            target_norm += '/'
+        prefixes.add(target_norm)
+    # Longest first, so nested roots resolve to the most specific one
+    prefixes = tuple(sorted(prefixes, key=len, reverse=True))
+
+    if len(prefixes) == 1:
+        target_norm = prefixes[0]
+        target_len = len(target_norm)
+
+        def match(file_path: str) -> Optional[str]:
+            file_path_norm = normalize_path(file_path)
+            if file_path_norm.startswith(target_norm):
+                return file_path_norm[target_len:]
+            return None
+    else:
+        # One output subdirectory per root, named after the root's last
+        # path component and deduplicated, so files from different roots
+        # that share a relative path restore side by side instead of
+        # silently overwriting each other.
+        namespaces = {}
+        for prefix in prefixes:
+            name = prefix.rstrip('/').rsplit('/', 1)[-1] or 'root'
+            candidate = name
+            suffix = 2
+            while candidate in namespaces.values():
+                candidate = f"{name}_{suffix}"
+                suffix += 1
+            namespaces[prefix] = candidate
+
+        def match(file_path: str) -> Optional[str]:
+            file_path_norm = normalize_path(file_path)
+            if not file_path_norm.startswith(prefixes):
+                return None
+            matched = next(p for p in prefixes if file_path_norm.startswith(p))
+            return namespaces[matched] + '/' + file_path_norm[len(matched):]
+
+    return match
+
+
+def _process_folder(folder_path: str, match, start_ms: int, end_ms: int,
+                    mtime: Optional[float] = None,
+                    cached: Optional[Tuple[float, bytes]] = None):
+    """
+    Parse one history folder's entries.json and pick its best entry.
+
+    Returns (result, cache_record). result is (relative_path,
+    backup_file_path, timestamp) when the folder tracks a file under the
+    target directory and has an entry within the time range, else None.
+    cache_record is (folder_path, mtime, raw_bytes) when the file had to
+    be read from disk (the caller persists it), or None when the cached
+    copy was still fresh. Safe to run on worker threads: the file read
+    and the C-level JSON parse both release the GIL.
+    """
+    cache_record = None
+    if cached is not None and mtime is not None and cached[0] == mtime:
+        raw = cached[1]
+    else:
+        entries_file = os.path.join(folder_path, "entries.json")
+        try:
+            # Read the whole file in one go through a 64KB buffer so the
+            # tiny JSON files cost 1-2 read syscalls instead of many.
+            with open(entries_file, 'rb', buffering=65536) as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None, None
+        if mtime is not None:
+            cache_record = (folder_path, mtime, raw)
+
+    data = _json_loads(raw)
+
+    resource_url = data.get('resource', '')
+    if not resource_url:
+        return None, cache_record
+
+    # Decode the file path
+    original_file_path = url_decode_path(resource_url)
+
+    # Check if this file is within our target directory and derive its
+    # relative path with a single prefix test
+    relative_path = match(original_file_path)
+    if relative_path is None:
+        return None, cache_record
+
+    # Find the latest entry within our time range. Compare the raw
+    # millisecond ints and let max() run the scan in C; constructing a
+    # datetime per entry just to compare it is interpreter overhead.
+    best = max(
+        ((entry['timestamp'], entry) for entry in data.get('entries', ())
+         if entry.get('timestamp') and start_ms <= entry['timestamp'] <= end_ms),
+        key=itemgetter(0), default=None)
+
+    if best:
+        timestamp_ms, latest_entry = best
+        backup_file_path = os.path.join(folder_path, latest_entry['id'])
+        if os.path.exists(backup_file_path):
+            # Only the winning entry is converted to a datetime
+            return ((relative_path, backup_file_path,
+                     parse_timestamp(timestamp_ms)), cache_record)
+
+    return None, cache_record
+
+
+def find_latest_files_from_history(history_dir: str,
+                                   target_restore_dir: Union[str, List[str]],
                                    start_time: datetime, end_time: datetime,
                                    verbose: bool = True) -> Dict[str, Tuple[str, datetime]]:
     """
     Find the latest version of each file within the specified directory and time range.
-    Uses the History folder method (entries.json files).
+    Uses the History folder method (entries.json files). With several
+    target directories, each one's files are keyed under a subdirectory
+    named after the root (see make_path_matcher).
     
     Returns:
         Dict mapping relative file paths to (backup_file_path, timestamp) tuples
@@ -101,77 +323,103 @@ def find_latest_files_from_history(history_dir: str, target_restore_dir: str,
     
     if verbose:
         print(f"Scanning history directory: {history_dir}")
-        print(f"Looking for files from: {target_restore_dir}")
+        targets = [target_restore_dir] if isinstance(target_restore_dir, str) else target_restore_dir
+        print(f"Looking for files from: {', '.join(targets)}")
         print(f"Time range: {start_time} to {end_time}")
     
+    # Specialize the path check for the target directories once, instead
+    # of re-deriving the normalized prefixes for every folder.
+    match = make_path_matcher(target_restore_dir)
+
+    # Previously scanned folders whose mtime is unchanged are served from
+    # the persistent cache instead of re-reading their entries.json.
+    cache_conn, cache_mtimes = _open_scan_cache()
+    cache_updates: List[Tuple[str, float, bytes]] = []
+    seen_folders = set()
+
+    # Millisecond bounds for the raw timestamp comparison, computed once
+    # for the whole scan rather than once per folder.
+    start_ms = int(start_time.timestamp() * 1000)
+    end_ms = int(end_time.timestamp() * 1000)
+    start_ts = start_ms / 1000
+
     folder_count = 0
     matching_files = 0
-    
-    # Iterate through all folders in the history directory
-    for folder in history_path.iterdir():
-        if not folder.is_dir():
-            continue
-            
-        folder_count += 1
-        entries_file = folder / "entries.json"
-        
-        if not entries_file.exists():
-            continue
-            
-        try:
-            with open(entries_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            resource_url = data.get('resource', '')
-            if not resource_url:
+    # Per-file progress lines are buffered and flushed in batches; a print
+    # per match means a line-buffered write syscall per file, which shows
+    # up once thousands of files are found.
+    found_lines = []
+
+    # Each folder is independent, and its cost is dominated by the file
+    # read and the C-level JSON parse - both release the GIL - so a thread
+    # pool overlaps the per-folder I/O latency. os.scandir reuses the file
+    # type returned by readdir, avoiding extra stat calls per folder.
+    with os.scandir(history_dir) as dir_iter, \
+            ThreadPoolExecutor(max_workers=16) as pool:
+        futures = {}
+        for dir_entry in dir_iter:
+            if not dir_entry.is_dir(follow_symlinks=False):
                 continue
-                
-            # Decode the file path
-            original_file_path = url_decode_path(resource_url)
-            
-            # Check if this file is within our target directory
-            if not is_path_in_directory(original_file_path, target_restore_dir):
+
+            folder_count += 1
+            seen_folders.add(dir_entry.path)
+
+            # Cursor bumps a history folder's mtime whenever it writes a
+            # new entry, so a folder untouched since before the window
+            # start cannot contain an in-range entry; skip it without
+            # opening its JSON at all. The mtime also keys the scan cache.
+            try:
+                mtime = dir_entry.stat(follow_symlinks=False).st_mtime
+            except OSError:
+                mtime = None
+            if mtime is not None and mtime < start_ts:
                 continue
-                
-            # Get relative path within the target directory
+
+            cached = None
+            if cache_conn is not None and mtime is not None \
+                    and cache_mtimes.get(dir_entry.path) == mtime:
+                data = _cached_scan_data(cache_conn, dir_entry.path)
+                if data is not None:
+                    cached = (mtime, data)
+
+            futures[pool.submit(_process_folder, dir_entry.path, match,
+                                start_ms, end_ms, mtime,
+                                cached)] = dir_entry.path
+
+        for future in as_completed(futures):
             try:
-                relative_path = get_relative_path(original_file_path, target_restore_dir)
-            except ValueError:
+                result, cache_record = future.result()
+            except (json.JSONDecodeError, KeyError, OSError) as e:
+                if verbose:
+                    print(f"Warning: Error processing {futures[future]}: {e}")
                 continue
-            
-            # Find the latest entry within our time range
-            latest_entry = None
-            latest_timestamp = None
-            
-            for entry in data.get('entries', []):
-                timestamp_ms = entry.get('timestamp')
-                if not timestamp_ms:
-                    continue
-                    
-                entry_time = parse_timestamp(timestamp_ms)
-                
-                # Check if within time range
-                if not (start_time <= entry_time <= end_time):
-                    continue
-                    
-                if latest_timestamp is None or entry_time > latest_timestamp:
-                    latest_entry = entry
-                    latest_timestamp = entry_time
-            
-            if latest_entry:
-                backup_file_path = folder / latest_entry['id']
-                if backup_file_path.exists():
-                    latest_files[relative_path] = (str(backup_file_path), latest_timestamp)
-                    matching_files += 1
-                    if verbose:
-                        print(f"Found: {relative_path} (from {latest_timestamp})")
-        
-        except (json.JSONDecodeError, KeyError, OSError) as e:
+
+            if cache_record is not None:
+                cache_updates.append(cache_record)
+            if result is None:
+                continue
+
+            relative_path, backup_file_path, latest_timestamp = result
+            # Completion order is arbitrary, so keep the newest timestamp
+            # if two folders claim the same relative path.
+            previous = latest_files.get(relative_path)
+            if previous is None or latest_timestamp > previous[1]:
+                latest_files[relative_path] = (backup_file_path, latest_timestamp)
+            matching_files += 1
             if verbose:
-                print(f"Warning: Error processing {folder}: {e}")
-            continue
-    
+                found_lines.append(f"Found: {relative_path} (from {latest_timestamp})\n")
+                if len(found_lines) >= 1000:
+                    _flush_lines(found_lines)
+
+    # Prune cache rows for folders that no longer exist under this history
+    # directory, so the cache cannot grow without bound as folders churn.
+    history_prefix = history_dir.rstrip('/') + '/'
+    stale = [folder for folder in cache_mtimes
+             if folder.startswith(history_prefix) and folder not in seen_folders]
+    _close_scan_cache(cache_conn, cache_updates, stale)
+
     if verbose:
+        _flush_lines(found_lines)
         print(f"\nProcessed {folder_count} folders, found {matching_files} matching files")
     return latest_files
 
@@ -185,25 +433,33 @@ def restore_files(latest_files: Dict[str, Tuple[str, datetime]], output_dir: str
         print(f"\nRestoring files to: {output_dir}")
     
     restored_count = 0
-    
+    restored_lines = []
+
+    # Create all parent directories up front, once per unique directory;
+    # a per-file mkdir would issue a redundant syscall for every file that
+    # shares a subtree.
+    parents = {(output_path / relative_path).parent for relative_path in latest_files}
+    for parent in sorted(parents, key=lambda p: len(p.parts)):
+        parent.mkdir(parents=True, exist_ok=True)
+
     for relative_path, (backup_file_path, timestamp) in latest_files.items():
         # Create the full output path
         output_file_path = output_path / relative_path
         
-        # Create parent directories if needed
-        output_file_path.parent.mkdir(parents=True, exist_ok=True)
-        
         try:
             # Copy the file
-            shutil.copy2(backup_file_path, output_file_path)
+            copy_backup_file(backup_file_path, str(output_file_path))
             if verbose:
-                print(f"Restored: {relative_path}")
+                restored_lines.append(f"Restored: {relative_path}\n")
+                if len(restored_lines) >= 1000:
+                    _flush_lines(restored_lines)
             restored_count += 1
         except OSError as e:
             if verbose:
-                print(f"Error restoring {relative_path}: {e}")
+                restored_lines.append(f"Error restoring {relative_path}: {e}\n")
     
     if verbose:
+        _flush_lines(restored_lines)
         print(f"\nSuccessfully restored {restored_count} files")
     
     return restored_count
@@ -217,23 +473,25 @@ def list_workspaces(cursor_dir: str) -> List[Dict[str, str]]:
     if not workspace_storage_dir.exists():
         return workspaces
     
-    for workspace_folder in workspace_storage_dir.iterdir():
-        if not workspace_folder.is_dir():
-            continue
-        
-        workspace_json = workspace_folder / "workspace.json"
-        if workspace_json.exists():
+    with os.scandir(workspace_storage_dir) as dir_iter:
+        for dir_entry in dir_iter:
+            if not dir_entry.is_dir(follow_symlinks=False):
+                continue
+
+            workspace_json = os.path.join(dir_entry.path, "workspace.json")
             try:
-                with open(workspace_json, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    folder_uri = data.get('folder', '')
-                    if folder_uri:
-                        folder_path = url_decode_path(folder_uri)
-                        workspaces.append({
-                            'id': workspace_folder.name,
-                            'path': folder_path,
-                            'db': str(workspace_folder / 'state.vscdb')
-                        })
+                with open(workspace_json, 'rb', buffering=65536) as f:
+                    data = _json_loads(f.read())
+                folder_uri = data.get('folder', '')
+                if folder_uri:
+                    folder_path = url_decode_path(folder_uri)
+                    workspaces.append({
+                        'id': dir_entry.name,
+                        'path': folder_path,
+                        'db': os.path.join(dir_entry.path, 'state.vscdb')
+                    })
+            except FileNotFoundError:
+                continue
             except (json.JSONDecodeError, OSError):
                 pass
     
@@ -255,6 +513,9 @@ Examples:
   # Use custom time range
   python cursor_restore_mac.py -r ~/Projects/MyProject/ -s "2024-01-01 00:00:00" -e "2024-12-31 23:59:59"
   
+  # Restore several directories at once
+  python cursor_restore_mac.py -r ~/Projects/ProjectA/ ~/Projects/ProjectB/
+  
   # List available workspaces
   python cursor_restore_mac.py --list-workspaces
         """
@@ -273,7 +534,9 @@ Examples:
                        help=f'Directory containing Cursor history (default: {default_history_dir})')
     
     parser.add_argument('--restore-path', '-r',
-                       help='Original directory path to restore (e.g., ~/Projects/MyProject/)')
+                       nargs='+',
+                       help='Original directory path(s) to restore (e.g., ~/Projects/MyProject/); '
+                            'with several paths, each is restored under its own subdirectory')
     
     parser.add_argument('--output-dir', '-o',
                        default='restoredFolder',
@@ -334,7 +597,7 @@ Examples:
         print("Cursor History Restore Script for macOS")
         print("=" * 80)
         print(f"History directory: {args.history_dir}")
-        print(f"Restore path: {args.restore_path}")
+        print(f"Restore path: {', '.join(args.restore_path)}")
         print(f"Output directory: {args.output_dir}")
         print(f"Time range: {start_time} to {end_time}")
         print()